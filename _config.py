@@ -0,0 +1,27 @@
+"""Shared environment handling for the toolkit scripts."""
+import os
+import sys
+
+
+def load_config(session=None):
+    """Validate the required env vars; returns (domain, access_key).
+
+    The domain comes back with any trailing slash already stripped so
+    helpers can concatenate endpoint paths directly. When a session is
+    given, the standard JSON + accesskey headers are installed on it.
+    """
+    domain = (os.environ.get("GAINSIGHT_DOMAIN") or "").rstrip('/')
+    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
+
+    if not domain or not access_key:
+        print("❌ Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
+        sys.exit(1)
+
+    if session is not None:
+        session.headers.update({
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "accesskey": access_key,
+        })
+
+    return domain, access_key
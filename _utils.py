@@ -0,0 +1,9 @@
+"""Shared helpers for the toolkit scripts."""
+
+
+def redact_email(email):
+    """Mask the local part of an email, e.g. e***@company.com."""
+    user, sep, domain = (email or '').rpartition('@')
+    if not sep:
+        return email
+    return f"{user[:1]}***@{domain}" if user else f"***@{domain}"
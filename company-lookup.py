@@ -5,18 +5,31 @@ Lookup a company name by GsCompanyId using the Company query endpoint.
 """
 import os
 import sys
-import json
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _config import load_config
+
+# One shared session so every request reuses the same pooled TLS connections.
+# Transient 429/5xx responses are retried with exponential backoff (and the
+# server's Retry-After is honoured) before a call is reported as failed.
+RETRIES = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=RETRIES))
+
+COMPANY_QUERY_PATH = "/v1/data/objects/query/Company"
 
 def lookup_company_by_id(domain, access_key, company_id):
     """Lookup company name by GsCompanyId using Company query endpoint"""
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/Company"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
+    url = f"{domain}{COMPANY_QUERY_PATH}"
 
     query = {
         "select": ["Gsid", "Name", "Industry", "ModifiedDate"],
@@ -37,14 +50,14 @@ def lookup_company_by_id(domain, access_key, company_id):
 
     try:
         print(f"🔍 Looking up company with ID: {company_id}")
-        resp = requests.post(url, headers=headers, data=json.dumps(query), timeout=15)
+        resp = SESSION.post(url, json=query, timeout=15)
 
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            print(f"   ❌ HTTP {resp.status_code}: {resp.text[:300]}")
-            return None
+        resp.raise_for_status()
+        return resp.json()
 
+    except requests.HTTPError as e:
+        print(f"   ❌ HTTP {e.response.status_code}: {e.response.text[:300]}")
+        return None
     except requests.RequestException as e:
         print(f"   ❌ Request error: {e}")
         return None
@@ -76,14 +89,9 @@ def main():
     parser.add_argument("--company-id", dest="company_id", help="GsCompanyId to lookup")
     args = parser.parse_args()
 
-    domain = os.environ.get("GAINSIGHT_DOMAIN")
-    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
+    domain, access_key = load_config(SESSION)
     company_id = args.company_id or os.environ.get("GAINSIGHT_COMPANY_ID")
 
-    if not domain or not access_key:
-        print("❌ Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
-        sys.exit(1)
-
     if not company_id:
         print("❌ Missing company ID. Provide --company-id or set GAINSIGHT_COMPANY_ID.")
         sys.exit(1)
@@ -109,8 +117,7 @@ def main():
         print("   • API key lacks Company read permissions")
         print("   • Company object not accessible")
 
-    print("
-🛡️  100% READ-ONLY: No data was modified, only viewed")
+    print("\n🛡️  100% READ-ONLY: No data was modified, only viewed")
 
 if __name__ == "__main__":
     main()
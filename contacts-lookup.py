@@ -5,39 +5,92 @@ Lists active contacts for a company using the company_person custom object.
 """
 import os
 import sys
-import json
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-def redact_email(email):
-    if not email or '@' not in email:
-        return email
-    user, domain = email.split('@', 1)
-    return f"{user[:1]}***@{domain}" if user else f"***@{domain}"
+from _config import load_config
+from _utils import redact_email
+
+try:
+    import orjson  # optional: C-backed decode, noticeably faster on 1000-row pages
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: stream-parse pages instead of holding the raw body
+except ImportError:
+    ijson = None
+
+# Malformed bodies surface differently per decoder: orjson raises ValueError,
+# ijson its own JSONError (a plain Exception, not a ValueError).
+DECODE_ERRORS = (ValueError, ijson.JSONError) if ijson else (ValueError,)
+
+# Record objects can appear under data.records or directly under data.
+_RECORD_PREFIXES = ('data.records.item', 'data.item')
+
+
+def _stream_records(raw):
+    """Incrementally parse a query response; returns (result, errorDesc, records).
+
+    Only one record dict is materialized at a time, so the raw JSON body is
+    never held in memory alongside the parsed page.
+    """
+    records = []
+    current = None
+    result_flag, error_desc = True, None
+
+    for prefix, event, value in ijson.parse(raw):
+        if prefix in _RECORD_PREFIXES:
+            if event == 'start_map':
+                current = {}
+            elif event == 'end_map':
+                records.append(current)
+                current = None
+        elif current is not None and event in ('string', 'number', 'boolean', 'null'):
+            for rec_prefix in _RECORD_PREFIXES:
+                if prefix.startswith(rec_prefix + '.'):
+                    current[prefix[len(rec_prefix) + 1:]] = value
+                    break
+        elif prefix == 'result':
+            result_flag = bool(value)
+        elif prefix == 'errorDesc':
+            error_desc = value
+
+    return result_flag, error_desc, records
+
+# One shared session so every request reuses the same pooled TLS connections.
+# Transient 429/5xx responses are retried with exponential backoff (and the
+# server's Retry-After is honoured) before a call is reported as failed.
+RETRIES = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=RETRIES))
+
+CONTACTS_QUERY_PATH = "/v1/data/objects/query/company_person"
 
 def fetch_contacts_by_company_gsid(domain, access_key, company_gsid):
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/company_person"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
-
-    contacts = []
-    offset = 0
+    url = f"{domain}{CONTACTS_QUERY_PATH}"
     limit = 1000
 
-    while True:
+    def fetch_page(offset):
+        # Only the fields the formatter renders; Active is already pinned
+        # to true by the filter and the Gsids were never printed.
         query = {
             "select": [
-                "Gsid",
-                "Person_ID__gr.Gsid",
                 "Person_ID__gr.FirstName",
                 "Person_ID__gr.LastName",
                 "Person_ID__gr.Email",
                 "Role",
-                "Title",
-                "Active"
+                "Title"
             ],
             "where": {
                 "conditions": [
@@ -65,46 +118,85 @@ def fetch_contacts_by_company_gsid(domain, access_key, company_gsid):
 
         try:
             print(f"🔍 Querying contacts (offset: {offset}, limit: {limit})...")
-            resp = requests.post(url, headers=headers, data=json.dumps(query), timeout=15)
-
-            if resp.status_code != 200:
-                print(f"   ❌ HTTP {resp.status_code}: {resp.text[:300]}")
-                return None
 
-            data = resp.json()
-            if not data.get('result'):
-                print(f"   ❌ API Error: {data.get('errorDesc', 'Unknown error')}")
-                return None
-
-            raw_data = data.get('data', [])
-            if isinstance(raw_data, dict) and 'records' in raw_data:
-                records = raw_data['records']
-            elif isinstance(raw_data, list):
-                records = raw_data
+            if ijson:
+                resp = SESSION.post(url, json=query, timeout=15, stream=True)
+                resp.raise_for_status()
+                resp.raw.decode_content = True  # gunzip before ijson sees it
+                ok, error_desc, records = _stream_records(resp.raw)
+                if not ok:
+                    print(f"   ❌ API Error: {error_desc or 'Unknown error'}")
+                    return None
             else:
-                print(f"   ❌ Unexpected data format")
-                return None
+                resp = SESSION.post(url, json=query, timeout=15)
+                resp.raise_for_status()
 
-            contacts.extend(records)
-            print(f"   📋 Found {len(records)} contacts in this batch")
+                data = orjson.loads(resp.content) if orjson else resp.json()
+                if not data.get('result'):
+                    print(f"   ❌ API Error: {data.get('errorDesc', 'Unknown error')}")
+                    return None
 
-            if len(records) < limit:
-                break
+                raw_data = data.get('data', [])
+                if isinstance(raw_data, dict) and 'records' in raw_data:
+                    records = raw_data['records']
+                elif isinstance(raw_data, list):
+                    records = raw_data
+                else:
+                    print(f"   ❌ Unexpected data format")
+                    return None
 
-            offset += limit
+            print(f"   📋 Found {len(records)} contacts in this batch")
+            return records
 
+        except requests.HTTPError as e:
+            print(f"   ❌ HTTP {e.response.status_code}: {e.response.text[:300]}")
+            return None
         except requests.RequestException as e:
             print(f"   ❌ Request error: {e}")
             return None
+        except DECODE_ERRORS as e:
+            # Neither is a RequestException like requests' own JSON decode
+            # error, so they need their own clause.
+            print(f"   ❌ Invalid JSON response: {e}")
+            return None
+
+    contacts = fetch_page(0)
+    if contacts is None:
+        return None
+    if len(contacts) < limit:
+        return contacts
+
+    # Total count is unknown up front, so keep a window of 2 pages in
+    # flight: the next page downloads while the previous one is consumed.
+    # A full page keeps the window topped up; a short page ends the scan.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        next_offset = limit
+        in_flight = deque()
+        for _ in range(2):
+            in_flight.append(executor.submit(fetch_page, next_offset))
+            next_offset += limit
+
+        while in_flight:
+            records = in_flight.popleft().result()
+            if records is None:
+                return None
+            contacts.extend(records)
+            if len(records) < limit:
+                break
+            in_flight.append(executor.submit(fetch_page, next_offset))
+            next_offset += limit
 
     return contacts
 
-def format_contacts_data(contacts, company_name="Unknown Company", redact=True):
+def format_contacts_data(contacts, out, company_name="Unknown Company", redact=True):
+    # Write lines straight to the target stream: no list of lines and no
+    # joined copy of the whole report held in memory for big contact lists.
     if not contacts:
-        return f"   No active contacts found for {company_name}"
+        out.write(f"   No active contacts found for {company_name}\n")
+        return
 
-    output = [f"   📊 Found {len(contacts)} active contacts for {company_name}:"]
-    output.append("   " + "=" * 60)
+    out.write(f"   📊 Found {len(contacts)} active contacts for {company_name}:\n")
+    out.write("   " + "=" * 60 + "\n")
 
     for i, contact in enumerate(contacts, 1):
         first_name = contact.get('Person_ID__gr.FirstName') or 'Unknown'
@@ -118,16 +210,13 @@ def format_contacts_data(contacts, company_name="Unknown Company", redact=True):
 
         name = f"{first_name} {last_name}".strip()
 
-        output.append(f"   {i}. 👤 {name}")
-        output.append(f"      📧 {email}")
+        out.write(f"   {i}. 👤 {name}\n")
+        out.write(f"      📧 {email}\n")
         if role != 'No role':
-            output.append(f"      🎯 Role: {role}")
+            out.write(f"      🎯 Role: {role}\n")
         if title != 'No title':
-            output.append(f"      💼 Title: {title}")
-        output.append("")
-
-    return "
-".join(output)
+            out.write(f"      💼 Title: {title}\n")
+        out.write("\n")
 
 def main():
     parser = argparse.ArgumentParser(description="List active contacts for a company (read-only).")
@@ -135,16 +224,11 @@ def main():
     parser.add_argument("--company-name", dest="company_name", help="Optional display name")
     args = parser.parse_args()
 
-    domain = os.environ.get("GAINSIGHT_DOMAIN")
-    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
+    domain, access_key = load_config(SESSION)
     company_gsid = args.company_id or os.environ.get("GAINSIGHT_COMPANY_ID")
     company_name = args.company_name or os.environ.get("GAINSIGHT_COMPANY_NAME") or "Unknown Company"
     redact = os.environ.get("GAINSIGHT_REDACT", "1") != "0"
 
-    if not domain or not access_key:
-        print("❌ Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
-        sys.exit(1)
-
     if not company_gsid:
         print("❌ Missing company ID. Provide --company-id or set GAINSIGHT_COMPANY_ID.")
         sys.exit(1)
@@ -158,10 +242,8 @@ def main():
     contacts = fetch_contacts_by_company_gsid(domain, access_key, company_gsid)
 
     if contacts is not None:
-        print("
-🎯 Results:")
-        formatted = format_contacts_data(contacts, company_name, redact=redact)
-        print(formatted)
+        print("\n🎯 Results:")
+        format_contacts_data(contacts, sys.stdout, company_name, redact=redact)
         print("-" * 40)
         print(f"✅ Contact lookup completed! Total: {len(contacts)} contacts")
     else:
@@ -172,8 +254,7 @@ def main():
         print("   • No company_person object access")
         print("   • Wrong domain for Custom Object API")
 
-    print("
-🛡️  100% READ-ONLY: No data was modified, only viewed")
+    print("\n🛡️  100% READ-ONLY: No data was modified, only viewed")
 
 if __name__ == "__main__":
     main()
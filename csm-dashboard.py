@@ -3,40 +3,72 @@
 CSM Dashboard - Complete workflow combining Timeline + Company + Contacts
 Ultra-safe READ-ONLY script
 """
+import io
 import os
 import sys
-import json
 import argparse
 import requests
-from collections import Counter
-
-
-def redact_email(email):
-    if not email or '@' not in email:
-        return email
-    user, domain = email.split('@', 1)
-    return f"{user[:1]}***@{domain}" if user else f"***@{domain}"
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import Counter, defaultdict
+
+from _config import load_config
+from _utils import redact_email
+
+try:
+    import orjson  # optional: C-backed decode, noticeably faster on large contact pages
+except ImportError:
+    orjson = None
+
+try:
+    import requests_cache  # optional: HTTP-level cache so re-runs skip round trips
+except ImportError:
+    requests_cache = None
+
+# One shared session so every request reuses the same pooled TLS connections.
+# Transient 429/5xx responses are retried with exponential backoff (and the
+# server's Retry-After is honoured) before a call is reported as failed.
+RETRIES = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+
+if requests_cache:
+    # Gainsight reads go over POST, so POST must be cacheable and the body is
+    # part of the cache key. Timeline responses live five minutes; contact
+    # responses are never written to disk (they contain emails).
+    SESSION = requests_cache.CachedSession(
+        os.path.join(os.path.expanduser("~"), ".gainsight_http_cache"),
+        backend="sqlite",
+        expire_after=300,
+        allowable_methods=["POST"],
+        urls_expire_after={
+            "*/v1/data/objects/query/company_person": requests_cache.DO_NOT_CACHE,
+        },
+    )
+else:
+    SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=RETRIES))
 
+TIMELINE_QUERY_PATH = "/v1/data/objects/query/activity_timeline"
+CONTACTS_QUERY_PATH = "/v1/data/objects/query/company_person"
 
 def get_timeline_activities(domain, access_key, user_email, limit=3):
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/activity_timeline"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
+    url = f"{domain}{TIMELINE_QUERY_PATH}"
 
+    # Only what the summary and STEP 2 consume, plus the company name and
+    # industry pulled through the GsCompanyId__gr traversal so no separate
+    # Company query is needed.
     query = {
         "select": [
-            "Gsid",
             "CreatedDate",
             "Subject",
-            "Notes",
-            "ActivityDate",
-            "contextname",
-            "AuthorId",
             "GsCompanyId",
-            "GsRelationshipId"
+            "GsCompanyId__gr.Name",
+            "GsCompanyId__gr.Industry"
         ],
         "where": {
             "conditions": [{
@@ -53,75 +85,40 @@ def get_timeline_activities(domain, access_key, user_email, limit=3):
     }
 
     try:
-        print(f"📧 Getting {limit} recent timeline activities for {user_email}...")
-        resp = requests.post(url, headers=headers, data=json.dumps(query), timeout=15)
-
-        if resp.status_code == 200:
-            data = resp.json()
-            if data.get('result'):
-                activities = data.get('data', {}).get('records', [])
-                print(f"   ✅ Found {len(activities)} activities")
-                return activities
-            else:
-                print(f"   ❌ API Error: {data.get('errorDesc')}")
-                return None
-        else:
-            print(f"   ❌ HTTP {resp.status_code}: {resp.text[:200]}")
-            return None
-
-    except requests.RequestException as e:
-        print(f"   ❌ Request error: {e}")
-        return None
-
+        print(f"📧 Getting {limit} recent timeline activities for {user_email}...", file=sys.stderr)
+        resp = SESSION.post(url, json=query, timeout=15)
+        resp.raise_for_status()
 
-def lookup_company_name(domain, access_key, company_gsid):
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/Company"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
+        data = resp.json()
+        if data.get('result'):
+            activities = data.get('data', {}).get('records', [])
+            print(f"   ✅ Found {len(activities)} activities", file=sys.stderr)
+            return activities
 
-    query = {
-        "select": ["Gsid", "Name", "Industry"],
-        "where": {
-            "conditions": [{
-                "name": "Gsid",
-                "alias": "A",
-                "value": [company_gsid],
-                "operator": "EQ"
-            }],
-            "expression": "A"
-        },
-        "limit": 1,
-        "offset": 0
-    }
-
-    try:
-        resp = requests.post(url, headers=headers, data=json.dumps(query), timeout=10)
-
-        if resp.status_code == 200:
-            data = resp.json()
-            if data.get('result'):
-                companies = data.get('data', {}).get('records', [])
-                if companies:
-                    return companies[0]
+        print(f"   ❌ API Error: {data.get('errorDesc')}", file=sys.stderr)
         return None
 
-    except requests.RequestException:
+    except requests.HTTPError as e:
+        print(f"   ❌ HTTP {e.response.status_code}: {e.response.text[:200]}", file=sys.stderr)
+        return None
+    except requests.RequestException as e:
+        print(f"   ❌ Request error: {e}", file=sys.stderr)
         return None
 
 
-def get_company_contacts(domain, access_key, company_gsid, limit=10):
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/company_person"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
+def get_contacts_for_companies(domain, access_key, gsids, limit=10):
+    """One batched company_person query; returns {gsid: [contacts]}."""
+    contacts_by_company = defaultdict(list)
+    if not gsids:
+        # No companies on the timeline activities: nothing to query, and an
+        # IN [] / limit 0 request is undefined behaviour server-side.
+        return contacts_by_company
+
+    url = f"{domain}{CONTACTS_QUERY_PATH}"
 
     query = {
         "select": [
+            "Company_ID",
             "Person_ID__gr.FirstName",
             "Person_ID__gr.LastName",
             "Person_ID__gr.Email",
@@ -132,8 +129,8 @@ def get_company_contacts(domain, access_key, company_gsid, limit=10):
                 {
                     "name": "Company_ID",
                     "alias": "A",
-                    "operator": "EQ",
-                    "value": [company_gsid]
+                    "operator": "IN",
+                    "value": list(gsids)
                 },
                 {
                     "name": "Active",
@@ -145,58 +142,54 @@ def get_company_contacts(domain, access_key, company_gsid, limit=10):
             "expression": "A AND B"
         },
         "orderBy": {"Person_ID__gr.LastName": "asc"},
-        "limit": limit,
+        "limit": limit * len(gsids),
         "offset": 0
     }
 
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(query), timeout=10)
+        resp = SESSION.post(url, json=query, timeout=10)
+        resp.raise_for_status()
 
-        if resp.status_code == 200:
-            data = resp.json()
-            if data.get('result'):
-                records = data.get('data', {}).get('records', [])
-                return records
-        return []
+        data = orjson.loads(resp.content) if orjson else resp.json()
+        if data.get('result'):
+            records = data.get('data', {}).get('records', [])
+            for rec in records:
+                contacts_by_company[rec.get('Company_ID')].append(rec)
+        return contacts_by_company
 
-    except requests.RequestException:
-        return []
+    # orjson signals a malformed body with ValueError, which is not a
+    # RequestException like requests' own JSON decode error.
+    except (requests.RequestException, ValueError):
+        return contacts_by_company
 
 
 def extract_email_domains(contacts):
-    domains = []
-
-    for contact in contacts:
-        email = contact.get('Person_ID__gr.Email', '')
-        if email and '@' in email:
-            domain = email.split('@')[1].lower()
-            domains.append(domain)
-
-    if domains:
-        domain_counts = Counter(domains)
-        return domain_counts
-
-    return {}
-
-
-def format_timeline_summary(activities):
+    # An empty Counter is falsy and supports .most_common(), so no special
+    # case is needed for contact lists without usable emails.
+    return Counter(
+        email.rpartition('@')[2].lower()
+        for email in (c.get('Person_ID__gr.Email') or '' for c in contacts)
+        if '@' in email
+    )
+
+
+def format_timeline_summary(activities, out):
+    # Write lines straight to the target stream instead of collecting and
+    # joining them; memory stays flat however many activities come back.
     if not activities:
-        return "   No activities found"
+        out.write("   No activities found\n")
+        return
 
-    output = [f"   📊 Found {len(activities)} recent activities:"]
+    out.write(f"   📊 Found {len(activities)} recent activities:\n")
 
     for i, activity in enumerate(activities, 1):
-        subject = activity.get('Subject', 'No subject')[:50]
+        subject = activity.get('Subject') or 'No subject'
+        if len(subject) > 50:
+            subject = subject[:50] + "..."
         company_id = activity.get('GsCompanyId', 'No company ID')
 
-        if subject:
-            subject = subject + "..." if len(subject) == 50 else subject
-
-        output.append(f"   {i}. 📧 {subject}")
-        output.append(f"      🏢 Company ID: {company_id}")
-
-    return "
-".join(output)
+        out.write(f"   {i}. 📧 {subject}\n")
+        out.write(f"      🏢 Company ID: {company_id}\n")
 
 
 def main():
@@ -205,15 +198,10 @@ def main():
     parser.add_argument("--limit", type=int, default=3, help="Max timeline activities")
     args = parser.parse_args()
 
-    domain = os.environ.get("GAINSIGHT_DOMAIN")
-    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
+    domain, access_key = load_config(SESSION)
     user_email = args.user_email or os.environ.get("GAINSIGHT_USER_EMAIL")
     redact = os.environ.get("GAINSIGHT_REDACT", "1") != "0"
 
-    if not domain or not access_key:
-        print("❌ Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
-        sys.exit(1)
-
     if not user_email:
         print("❌ Missing user email. Provide --user-email or set GAINSIGHT_USER_EMAIL.")
         sys.exit(1)
@@ -223,51 +211,60 @@ def main():
     print(f"👤 User: {user_email}")
     print("=" * 80)
 
-    print("
-🔄 STEP 1: Getting recent timeline activities...")
+    print("\n🔄 STEP 1: Getting recent timeline activities...", file=sys.stderr)
     activities = get_timeline_activities(domain, access_key, user_email, limit=args.limit)
 
     if not activities:
         print("❌ Failed to get timeline activities")
         sys.exit(1)
 
-    print(format_timeline_summary(activities))
+    format_timeline_summary(activities, sys.stderr)
 
-    print("
-🔄 STEP 2: Extracting company GSIDs...")
-    company_gsids = []
-    for activity in activities:
-        gsid = activity.get('GsCompanyId')
-        if gsid and gsid not in company_gsids:
-            company_gsids.append(gsid)
+    print("\n🔄 STEP 2: Extracting company GSIDs...", file=sys.stderr)
+    company_gsids = list(dict.fromkeys(
+        a.get('GsCompanyId') for a in activities if a.get('GsCompanyId')
+    ))
 
-    print(f"   🏢 Found {len(company_gsids)} unique companies")
+    print(f"   🏢 Found {len(company_gsids)} unique companies", file=sys.stderr)
 
-    print("
-🔄 STEP 3: Processing each company...")
+    print("\n🔄 STEP 3: Processing each company...", file=sys.stderr)
     all_results = []
 
+    # Company name and industry already arrived on the timeline rows via the
+    # GsCompanyId__gr traversal, so the only remaining network call is the
+    # batched contacts query: the whole run costs 1 + 1 requests.
+    gsid_to_company = {}
+    for activity in activities:
+        gsid = activity.get('GsCompanyId')
+        name = activity.get('GsCompanyId__gr.Name')
+        if gsid and name and gsid not in gsid_to_company:
+            gsid_to_company[gsid] = {
+                'Name': name,
+                'Industry': activity.get('GsCompanyId__gr.Industry'),
+            }
+
+    contacts_by_company = get_contacts_for_companies(domain, access_key, company_gsids, 10)
+
     for i, company_gsid in enumerate(company_gsids, 1):
-        print(f"
-   🔍 Processing Company {i}/{len(company_gsids)}: {company_gsid}")
+        print(f"\n   🔍 Processing Company {i}/{len(company_gsids)}: {company_gsid}", file=sys.stderr)
 
-        print(f"      📋 Looking up company name...")
-        company_info = lookup_company_name(domain, access_key, company_gsid)
+        print(f"      📋 Looking up company name...", file=sys.stderr)
+        company_info = gsid_to_company.get(company_gsid)
 
         if company_info:
             company_name = company_info.get('Name', 'Unknown Company')
             industry = company_info.get('Industry') or 'Unknown Industry'
-            print(f"      ✅ Company: {company_name} ({industry})")
+            print(f"      ✅ Company: {company_name} ({industry})", file=sys.stderr)
         else:
             company_name = f"Unknown Company ({company_gsid[:20]}...)"
             industry = "Unknown Industry"
-            print(f"      ❌ Could not lookup company name")
+            print(f"      ❌ Could not lookup company name", file=sys.stderr)
 
-        print(f"      👥 Getting top 10 contacts...")
-        contacts = get_company_contacts(domain, access_key, company_gsid, limit=10)
+        print(f"      👥 Getting top 10 contacts...", file=sys.stderr)
+        contacts = contacts_by_company.get(company_gsid, [])
 
         if contacts:
-            print(f"      ✅ Found {len(contacts)} contacts")
+            print(f"      ✅ Found {len(contacts)} contacts", file=sys.stderr)
             domain_counts = extract_email_domains(contacts)
             primary_domain = max(domain_counts.items(), key=lambda x: x[1])[0] if domain_counts else "Unknown"
 
@@ -281,7 +278,7 @@ def main():
             })
 
         else:
-            print(f"      ❌ No contacts found")
+            print(f"      ❌ No contacts found", file=sys.stderr)
             all_results.append({
                 'gsid': company_gsid,
                 'name': company_name,
@@ -291,24 +288,26 @@ def main():
                 'primary_domain': 'Unknown'
             })
 
-    print("
-" + "=" * 80)
-    print("🎯 FINAL DASHBOARD RESULTS")
-    print("=" * 80)
+    # Build the whole report in memory and emit it with a single write:
+    # no stdout lock ping-pong per line, and consumers piping the output
+    # get it atomically while progress chatter stays on stderr.
+    buf = io.StringIO()
+    buf.write("\n" + "=" * 80 + "\n")
+    buf.write("🎯 FINAL DASHBOARD RESULTS\n")
+    buf.write("=" * 80 + "\n")
 
     for i, result in enumerate(all_results, 1):
-        print(f"
-🏢 COMPANY {i}: {result['name']}")
-        print(f"   🆔 GSID: {result['gsid']}")
-        print(f"   🏭 Industry: {result['industry']}")
+        buf.write(f"\n🏢 COMPANY {i}: {result['name']}\n")
+        buf.write(f"   🆔 GSID: {result['gsid']}\n")
+        buf.write(f"   🏭 Industry: {result['industry']}\n")
 
         if result['domain_counts']:
-            print(f"   📊 Email Domains:")
+            buf.write(f"   📊 Email Domains:\n")
             for domain, count in result['domain_counts'].most_common():
                 shown_domain = "redacted-domain" if redact else domain
-                print(f"      • @{shown_domain} ({count} contacts)")
+                buf.write(f"      • @{shown_domain} ({count} contacts)\n")
 
-        print(f"   👥 Top {len(result['contacts'])} Contacts:")
+        buf.write(f"   👥 Top {len(result['contacts'])} Contacts:\n")
         for j, contact in enumerate(result['contacts'][:10], 1):
             name = f"{contact.get('Person_ID__gr.FirstName', '')} {contact.get('Person_ID__gr.LastName', '')}".strip()
             email = contact.get('Person_ID__gr.Email', 'No email')
@@ -317,15 +316,16 @@ def main():
             if redact and email != 'No email':
                 email = redact_email(email)
 
-            print(f"      {j}. {name}")
-            print(f"         📧 {email}")
+            buf.write(f"      {j}. {name}\n")
+            buf.write(f"         📧 {email}\n")
             if title != 'No title':
-                print(f"         💼 {title}")
+                buf.write(f"         💼 {title}\n")
+
+    buf.write("\n" + "=" * 80 + "\n")
+    buf.write("✅ CSM Dashboard completed successfully!\n")
+    buf.write("🛡️  100% READ-ONLY: No data was modified, only viewed\n")
 
-    print("
-" + "=" * 80)
-    print("✅ CSM Dashboard completed successfully!")
-    print("🛡️  100% READ-ONLY: No data was modified, only viewed")
+    sys.stdout.write(buf.getvalue())
 
 if __name__ == "__main__":
     main()
@@ -1,22 +1,29 @@
-import os
-import sys
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _config import load_config
+
+# One shared session so every request reuses the same pooled TLS connections.
+# Transient 429/5xx responses are retried with exponential backoff (and the
+# server's Retry-After is honoured) before a call is reported as failed.
+RETRIES = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=RETRIES))
+
+USERS_LIST_PATH = "/v1/users/services/list"
 
 def main():
-    domain = os.environ.get("GAINSIGHT_DOMAIN")
-    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
-
-    if not domain or not access_key:
-        print("Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
-        sys.exit(1)
-
-    url = f"{domain.rstrip('/')}/v1/users/services/list"  # read-only user listing
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,  # Gainsight header for API auth
-    }
+    domain, access_key = load_config(SESSION)
+
+    url = f"{domain}{USERS_LIST_PATH}"  # read-only user listing
 
     # Strictly READ parameters: limit small, select a few safe fields
     body = {
@@ -29,7 +36,7 @@ def main():
     }
 
     try:
-        resp = requests.post(url, headers=headers, data=json.dumps(body), timeout=20)
+        resp = SESSION.post(url, json=body, timeout=20)
         print(f"HTTP {resp.status_code}")
         # Try to pretty-print JSON if possible
         try:
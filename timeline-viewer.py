@@ -8,27 +8,39 @@ import sys
 import json
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _config import load_config
 from datetime import datetime
 
+# One shared session so every request reuses the same pooled TLS connections.
+# Transient 429/5xx responses are retried with exponential backoff (and the
+# server's Retry-After is honoured) before a call is reported as failed.
+RETRIES = Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["POST"]),
+    respect_retry_after_header=True,
+)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=RETRIES))
+
+TIMELINE_QUERY_PATH = "/v1/data/objects/query/activity_timeline"
+
 def safe_timeline_query(domain, access_key, user_email, limit=3):
-    url = f"{domain.rstrip('/')}/v1/data/objects/query/activity_timeline"
-    headers = {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        "accesskey": access_key,
-    }
+    url = f"{domain}{TIMELINE_QUERY_PATH}"
 
+    # Only the fields the formatter renders: Notes alone can be tens of KB
+    # per activity, so leaving it out shrinks the response dramatically.
     safe_query = {
         "select": [
             "Gsid",
             "CreatedDate",
             "Subject",
-            "Notes",
             "ActivityDate",
-            "contextname",
-            "AuthorId",
-            "GsCompanyId",
-            "GsRelationshipId"
+            "contextname"
         ],
         "where": {
             "conditions": [
@@ -50,21 +62,23 @@ def safe_timeline_query(domain, access_key, user_email, limit=3):
 
     try:
         print(f"🔍 Querying Timeline activities for {user_email} (limit: {limit})...")
-        resp = requests.post(url, headers=headers, data=json.dumps(safe_query), timeout=15)
-
-        if resp.status_code == 200:
-            return resp.json()
-        else:
-            print(f"   ❌ HTTP {resp.status_code}: {resp.text[:200]}")
-            return None
+        resp = SESSION.post(url, json=safe_query, timeout=15)
+        resp.raise_for_status()
+        return resp.json()
 
+    except requests.HTTPError as e:
+        print(f"   ❌ HTTP {e.response.status_code}: {e.response.text[:200]}")
+        return None
     except requests.RequestException as e:
         print(f"   ❌ Request error: {e}")
         return None
 
-def format_timeline_data(data):
+def format_timeline_data(data, out):
+    # Write lines straight to the target stream instead of collecting and
+    # joining them; memory stays flat however many activities come back.
     if not data or not data.get('result'):
-        return "   No Timeline data available"
+        out.write("   No Timeline data available\n")
+        return
 
     records = data.get('data', {})
     if isinstance(records, dict) and 'records' in records:
@@ -72,38 +86,41 @@ def format_timeline_data(data):
     elif isinstance(records, list):
         activities = records
     else:
-        return "   Unexpected data format from Timeline API"
+        out.write("   Unexpected data format from Timeline API\n")
+        return
 
     if not activities:
-        return "   No activities found in Timeline"
+        out.write("   No activities found in Timeline\n")
+        return
 
-    output = [f"   📊 Found {len(activities)} Timeline activities:"]
+    out.write(f"   📊 Found {len(activities)} Timeline activities:\n")
 
     for i, activity in enumerate(activities, 1):
         date_str = "Unknown date"
-        for date_field in ['ActivityDate', 'CreatedDate']:
-            if date_field in activity and activity[date_field]:
-                try:
-                    date_obj = datetime.fromisoformat(activity[date_field].replace('Z', '+00:00'))
-                    date_str = date_obj.strftime("%Y-%m-%d %H:%M")
-                    break
-                except Exception:
-                    pass
+        for date_field in ('ActivityDate', 'CreatedDate'):
+            raw = activity.get(date_field)
+            if not raw:
+                continue
+            try:
+                # Strip a trailing Z (UTC) by slicing; cheaper than .replace
+                # and works on Pythons where fromisoformat rejects the suffix.
+                date_obj = datetime.fromisoformat(raw[:-1] if raw.endswith('Z') else raw)
+            except ValueError:
+                continue
+            date_str = date_obj.strftime("%Y-%m-%d %H:%M")
+            break
 
         context = activity.get('contextname', 'Unknown')
-        subject = activity.get('Subject', 'No subject')
-        if subject and len(subject) > 50:
+        subject = activity.get('Subject') or 'No subject'
+        if len(subject) > 50:
             subject = subject[:50] + "..."
 
-        gsid = activity.get('Gsid', 'Unknown')[:10] + "..."
-
-        output.append(f"   {i}. [{date_str}] {context} context")
-        if subject and subject != 'No subject':
-            output.append(f"      📧 {subject}")
-        output.append(f"      🆔 {gsid}")
+        gsid = (activity.get('Gsid') or 'Unknown')[:10] + "..."
 
-    return "
-".join(output)
+        out.write(f"   {i}. [{date_str}] {context} context\n")
+        if subject != 'No subject':
+            out.write(f"      📧 {subject}\n")
+        out.write(f"      🆔 {gsid}\n")
 
 def main():
     parser = argparse.ArgumentParser(description="View recent timeline activities (read-only).")
@@ -112,14 +129,9 @@ def main():
     parser.add_argument("--debug", action="store_true", help="Print raw JSON payload")
     args = parser.parse_args()
 
-    domain = os.environ.get("GAINSIGHT_DOMAIN")
-    access_key = os.environ.get("GAINSIGHT_ACCESS_KEY")
+    domain, access_key = load_config(SESSION)
     user_email = args.user_email or os.environ.get("GAINSIGHT_USER_EMAIL")
 
-    if not domain or not access_key:
-        print("❌ Missing env vars. Set GAINSIGHT_DOMAIN and GAINSIGHT_ACCESS_KEY.")
-        sys.exit(1)
-
     if not user_email:
         print("❌ Missing user email. Provide --user-email or set GAINSIGHT_USER_EMAIL.")
         sys.exit(1)
@@ -135,10 +147,8 @@ def main():
         if args.debug:
             print("📝 Raw JSON:")
             print(json.dumps(data, indent=2))
-            print("
-" + "=" * 80)
-        formatted = format_timeline_data(data)
-        print(formatted)
+            print("\n" + "=" * 80)
+        format_timeline_data(data, sys.stdout)
         print("-" * 40)
         print("✅ Successfully accessed Timeline API!")
     else:
@@ -148,8 +158,7 @@ def main():
         print("   • API key lacks Timeline read permissions")
         print("   • No Timeline activities in the system")
 
-    print("
-🛡️  100% READ-ONLY: No data was modified, only viewed")
+    print("\n🛡️  100% READ-ONLY: No data was modified, only viewed")
 
 if __name__ == "__main__":
     main()